@@ -0,0 +1,104 @@
+"""Проверка плоского инференса: совпадение с sklearn и задержка на одной строке.
+
+Запуск:
+    python check_flat_forest.py --rows 2000 --repeats 500
+"""
+import argparse
+import os
+import pickle
+import tempfile
+import time
+
+import numpy as np
+from sklearn.ensemble import RandomForestClassifier
+from sklearn.preprocessing import StandardScaler
+
+from flat_forest import export_flat_model, flat_model_path, load_current_flat_model
+
+N_FEATURES = 10  # Столько признаков отдает prepare_data
+
+
+def fit_reference(rows, seed):
+    """Fits a scaler and forest the way train_model does, on synthetic features."""
+    rng = np.random.default_rng(seed)
+    X = rng.normal(size=(rows, N_FEATURES)) * rng.uniform(1, 1000, N_FEATURES)
+    y = (X[:, 0] / X[:, 0].std() + rng.normal(scale=2.0, size=rows) > 0).astype(int)
+
+    scaler = StandardScaler()
+    X_scaled = scaler.fit_transform(X)
+    model = RandomForestClassifier(random_state=seed)  # 100 деревьев, как в train_model: четное число дает ничьи 0.5
+    model.fit(X_scaled, y)
+    return model, scaler
+
+
+def check_parity(model, scaler, flat_model, flat_scaler, X):
+    """Asserts that flat predictions equal sklearn's. Returns the number of exact 0.5 ties checked."""
+    expected_proba = model.predict_proba(scaler.transform(X))
+    actual_proba = flat_model.predict_proba(flat_scaler.transform(X))
+    if not np.array_equal(expected_proba, actual_proba):
+        diff = np.abs(expected_proba - actual_proba).max()
+        raise AssertionError(f"predict_proba differs from sklearn (max abs diff {diff!r}).")
+
+    expected = model.predict(scaler.transform(X))
+    actual = flat_model.predict(flat_scaler.transform(X))
+    if not np.array_equal(expected, actual):
+        raise AssertionError(f"predict differs from sklearn on {int((expected != actual).sum())} rows.")
+
+    return int((expected_proba[:, 0] == 0.5).sum())
+
+
+def time_single_row(predict, row, repeats):
+    """Median latency of predict(row) in microseconds."""
+    timings = []
+    for _ in range(repeats):
+        started = time.perf_counter()
+        predict(row)
+        timings.append(time.perf_counter() - started)
+    return float(np.median(timings)) * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Check flat forest inference against sklearn.")
+    parser.add_argument("--rows", type=int, default=2000, help="Rows used to fit and to check the forest.")
+    parser.add_argument("--repeats", type=int, default=500, help="Single-row predictions per timing.")
+    parser.add_argument("--seed", type=int, default=42, help="Random seed.")
+    args = parser.parse_args()
+
+    model, scaler = fit_reference(args.rows, args.seed)
+
+    with tempfile.TemporaryDirectory() as workdir:
+        model_file = os.path.join(workdir, "model.pkl")
+        with open(model_file, "wb") as file:
+            pickle.dump((model, scaler), file)
+        export_flat_model(model, scaler, flat_model_path(model_file), model_file)
+        flat = load_current_flat_model(model_file)
+        if flat is None:
+            raise AssertionError("Fresh export was not recognized as current.")
+    flat_model, flat_scaler = flat
+
+    rng = np.random.default_rng(args.seed + 1)
+    X = rng.normal(size=(args.rows, N_FEATURES)) * scaler.scale_ + scaler.mean_
+    ties = check_parity(model, scaler, flat_model, flat_scaler, X)
+    if ties == 0:
+        raise AssertionError("No exact 0.5 ties in the check set; increase --rows.")
+
+    X_nan = X.copy()
+    X_nan[rng.random(X.shape) < 0.1] = np.nan  # Как RSI на короткой истории
+    try:
+        nan_ties = check_parity(model, scaler, flat_model, flat_scaler, X_nan)
+        nan_status = f"match ({nan_ties} ties)"
+    except ValueError as e:
+        nan_status = f"rejected: {e}"
+
+    row = X[:1]
+    sklearn_us = time_single_row(lambda r: model.predict(scaler.transform(r)), row, args.repeats)
+    flat_us = time_single_row(lambda r: flat_model.predict(flat_scaler.transform(r)), row, args.repeats)
+
+    print(f"Parity:             {args.rows} rows match, {ties} exact 0.5 ties")
+    print(f"NaN rows:           {nan_status}")
+    print(f"Single-row latency: sklearn {sklearn_us:.0f} us, flat {flat_us:.0f} us "
+          f"({sklearn_us / flat_us:.1f}x)")
+
+
+if __name__ == "__main__":
+    main()
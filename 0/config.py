@@ -5,9 +5,14 @@ API_SECRET = os.environ.get("API_SECRET")
 TELEGRAM_TOKEN = os.environ.get("TELEGRAM_TOKEN")
 CHAT_ID = os.environ.get("CHAT_ID")
 
+EXCHANGE_ID = os.environ.get("EXCHANGE_ID", "binance")
+
 CSV_FILE = "signal_log.csv"
 MODEL_FILE = "model.pkl"
 
+# Число процессов-сканеров; 0 — все работает в одном процессе
+SCAN_WORKERS = int(os.environ.get("SCAN_WORKERS", "0"))
+
 # Проверка на наличие всех ключей.  Вы можете добавить более сложную проверку
 if not all([API_KEY, API_SECRET, TELEGRAM_TOKEN, CHAT_ID]):
     raise ValueError("Не все ключи API установлены.")
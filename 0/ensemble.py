@@ -0,0 +1,274 @@
+import logging
+from datetime import datetime
+
+import numpy as np
+import talib
+
+from strategy import aggregate_signals
+
+PRICE_COLUMNS = ("open", "high", "low", "close", "volume")
+
+# Синонимы индикаторов: MEAN_5 и SMA_5 — один и тот же столбец, считаем его один раз
+INDICATOR_ALIASES = {"MEAN": "SMA"}
+
+
+class Indicator:
+    """A node of the indicator graph.
+
+    Args:
+        name: Canonical column name, e.g. "RSI_14".
+        func: Callable taking the dependency columns (in order) and returning a numpy array.
+        deps: Names of the columns this indicator is computed from.
+    """
+
+    def __init__(self, name, func, deps=("close",)):
+        self.name = name
+        self.func = func
+        self.deps = tuple(deps)
+
+
+def _sma(period):
+    return Indicator(f"SMA_{period}", lambda close: talib.SMA(close, timeperiod=period))
+
+
+def _rsi(period):
+    return Indicator(f"RSI_{period}", lambda close: talib.RSI(close, timeperiod=period))
+
+
+def _std(period):
+    return Indicator(f"STD_{period}", lambda close: talib.STDDEV(close, timeperiod=period, nbdev=1))
+
+
+def _bb_upper(period):
+    return Indicator(f"BB_UPPER_{period}", lambda sma, std: sma + 2 * std, deps=(f"SMA_{period}", f"STD_{period}"))
+
+
+def _bb_lower(period):
+    return Indicator(f"BB_LOWER_{period}", lambda sma, std: sma - 2 * std, deps=(f"SMA_{period}", f"STD_{period}"))
+
+
+INDICATOR_FACTORIES = {
+    "SMA": _sma,
+    "RSI": _rsi,
+    "STD": _std,
+    "BB_UPPER": _bb_upper,
+    "BB_LOWER": _bb_lower,
+}
+
+
+def canonical_name(name):
+    """Maps an indicator name such as "MEAN_5" to its canonical column name ("SMA_5")."""
+    if name in PRICE_COLUMNS:
+        return name
+    kind, _, period = name.rpartition("_")
+    if not kind or not period.isdigit():
+        raise ValueError(f"Unknown indicator {name}. Expected KIND_PERIOD, e.g. RSI_14.")
+    kind = INDICATOR_ALIASES.get(kind, kind)
+    if kind not in INDICATOR_FACTORIES:
+        raise ValueError(f"Unknown indicator kind {kind} in {name}.")
+    return f"{kind}_{period}"
+
+
+class IndicatorGraph:
+    """Shared DAG of indicators. Each unique node is computed at most once per call to compute()."""
+
+    def __init__(self):
+        self.nodes = {}
+        self.computations = 0
+
+    def add(self, name):
+        """Registers an indicator and all its dependencies. Returns the canonical name."""
+        name = canonical_name(name)
+        if name in PRICE_COLUMNS or name in self.nodes:
+            return name
+        kind, _, period = name.rpartition("_")
+        node = INDICATOR_FACTORIES[kind](int(period))
+        self.nodes[name] = node
+        for dep in node.deps:
+            self.add(dep)
+        return name
+
+    def order(self, names):
+        """Returns the nodes needed for names in dependency (topological) order."""
+        ordered, seen = [], set()
+
+        def visit(name):
+            if name in seen or name in PRICE_COLUMNS:
+                return
+            seen.add(name)
+            node = self.nodes[name]
+            for dep in node.deps:
+                visit(dep)
+            ordered.append(node)
+
+        for name in names:
+            visit(canonical_name(name))
+        return ordered
+
+    def compute(self, data, names, columns=None):
+        """Computes the requested indicators, reusing anything already present in columns.
+
+        Args:
+            data (pd.DataFrame): OHLCV data for one symbol.
+            names: Indicator names to compute.
+            columns (dict, optional): Already computed columns for the same bar.
+
+        Returns:
+            dict: Column name -> numpy array.
+        """
+        if columns is None:
+            columns = {col: data[col].values.astype(float) for col in PRICE_COLUMNS if col in data.columns}
+
+        for node in self.order(names):
+            if node.name not in columns:
+                columns[node.name] = node.func(*(columns[dep] for dep in node.deps))
+                self.computations += 1
+        return columns
+
+
+class EnsembleStrategy:
+    def __init__(self, name, func, indicators, weight=1.0, params=None):
+        self.name = name
+        self.func = func
+        self.indicators = indicators  # {объявленное имя: каноническое имя}
+        self.weight = weight
+        self.params = params or {}
+
+
+class EnsembleRunner:
+    """Runs several strategies for a symbol on shared, cached indicator columns and votes on the result.
+
+    Args:
+        threshold: Minimum total vote weight passed to aggregate_signals.
+        graph (IndicatorGraph, optional): Indicator graph to share between runners.
+    """
+
+    def __init__(self, threshold=1, graph=None):
+        self.threshold = threshold
+        self.graph = graph or IndicatorGraph()
+        self.strategies = []
+        self._cache = {}  # symbol -> (ключ бара, столбцы)
+
+    def register(self, name, func, indicators=(), weight=1.0, **params):
+        """Registers a strategy with its declared indicator dependencies.
+
+        Args:
+            name: Strategy name used in logs.
+            func: Callable (columns, symbol, **params) -> signal_info dict or None.
+            indicators: Indicator names the strategy reads from columns, e.g. ["RSI_14", "MEAN_5"].
+            weight: Vote weight of the strategy in aggregate_signals.
+            **params: Extra keyword arguments passed to func.
+        """
+        declared = {indicator: self.graph.add(indicator) for indicator in indicators}
+        self.strategies.append(EnsembleStrategy(name, func, declared, weight, params))
+
+    def required_indicators(self):
+        return {canonical for strategy in self.strategies for canonical in strategy.indicators.values()}
+
+    def columns(self, symbol, data):
+        """Returns indicator columns for the latest bar of symbol, computing only what is not cached."""
+        # Незакрытая свеча меняет close при том же timestamp, поэтому close входит в ключ
+        bar_key = (len(data), data["timestamp"].iloc[-1] if "timestamp" in data.columns else None,
+                   data["close"].iloc[-1])
+        cached = self._cache.get(symbol)
+        columns = cached[1] if cached is not None and cached[0] == bar_key else None
+        columns = self.graph.compute(data, self.required_indicators(), columns)
+        self._cache[symbol] = (bar_key, columns)
+        return columns
+
+    def run(self, symbol, data):
+        """Runs all registered strategies for symbol and aggregates their weighted votes.
+
+        Args:
+            symbol: The trading symbol.
+            data (pd.DataFrame): OHLCV data for the symbol.
+
+        Returns:
+            dict or None: Aggregated signal info, or None if there is no consensus or data.
+        """
+        if data is None or data.empty:
+            logging.warning(f"No data for ensemble on {symbol}.")
+            return None
+
+        try:
+            columns = self.columns(symbol, data)
+        except Exception as e:
+            logging.error(f"Error computing indicators for {symbol}: {e}")
+            return None
+
+        signals, weights = [], []
+        for strategy in self.strategies:
+            view = {"close": columns["close"]}
+            view.update({declared: columns[canonical] for declared, canonical in strategy.indicators.items()})
+            try:
+                signals.append(strategy.func(view, symbol, **strategy.params))
+                weights.append(strategy.weight)
+            except Exception as e:
+                logging.error(f"Error in strategy {strategy.name} for {symbol}: {e}")
+
+        return aggregate_signals(signals, threshold=self.threshold, weights=weights)
+
+
+def _signal_info(symbol, signal, current_price, take_profit_pct=2, stop_loss_pct=2):
+    return {
+        "timestamp": datetime.now(),
+        "symbol": symbol,
+        "signal": signal,
+        "current_price": current_price,
+        "entry_range": (current_price * 0.99, current_price * 1.01),
+        "take_profit": current_price * (1 + take_profit_pct / 100),
+        "stop_loss": current_price * (1 - stop_loss_pct / 100),
+    }
+
+
+# Стратегии для ансамбля: читают только объявленные столбцы и не считают индикаторы сами
+
+
+def average_price_vote(columns, symbol, avg_period=5, **kwargs):
+    """Same rule as example_strategy: Long when the price is above its average."""
+    avg_price = columns[f"MEAN_{avg_period}"][-1]
+    current_price = columns["close"][-1]
+    if np.isnan(avg_price):
+        return None
+    signal = "🔺Long" if current_price > avg_price else "🔻Short"
+    return _signal_info(symbol, signal, current_price, **kwargs)
+
+
+def rsi_vote(columns, symbol, period=14, oversold=30, overbought=70, **kwargs):
+    """Long when RSI is oversold, Short when overbought, no vote otherwise."""
+    rsi = columns[f"RSI_{period}"][-1]
+    if np.isnan(rsi) or oversold <= rsi <= overbought:
+        return None
+    signal = "🔺Long" if rsi < oversold else "🔻Short"
+    return _signal_info(symbol, signal, columns["close"][-1], **kwargs)
+
+
+def sma_cross_vote(columns, symbol, fast=5, slow=20, **kwargs):
+    """Long when the fast SMA is above the slow SMA."""
+    fast_sma = columns[f"SMA_{fast}"][-1]
+    slow_sma = columns[f"SMA_{slow}"][-1]
+    if np.isnan(fast_sma) or np.isnan(slow_sma):
+        return None
+    signal = "🔺Long" if fast_sma > slow_sma else "🔻Short"
+    return _signal_info(symbol, signal, columns["close"][-1], **kwargs)
+
+
+def bollinger_vote(columns, symbol, period=20, **kwargs):
+    """Long below the lower band, Short above the upper band, no vote inside the bands."""
+    upper = columns[f"BB_UPPER_{period}"][-1]
+    lower = columns[f"BB_LOWER_{period}"][-1]
+    current_price = columns["close"][-1]
+    if np.isnan(upper) or np.isnan(lower) or lower <= current_price <= upper:
+        return None
+    signal = "🔺Long" if current_price < lower else "🔻Short"
+    return _signal_info(symbol, signal, current_price, **kwargs)
+
+
+def default_ensemble(threshold=1):
+    """Builds an ensemble of the built-in strategies. SMA_5, SMA_20 and STD_20 are shared between them."""
+    runner = EnsembleRunner(threshold=threshold)
+    runner.register("average_price", average_price_vote, ["MEAN_5"], avg_period=5)
+    runner.register("rsi", rsi_vote, ["RSI_14"], weight=1.5, period=14)
+    runner.register("sma_cross", sma_cross_vote, ["SMA_5", "SMA_20"], fast=5, slow=20)
+    runner.register("bollinger", bollinger_vote, ["BB_UPPER_20", "BB_LOWER_20"], period=20)
+    return runner
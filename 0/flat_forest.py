@@ -0,0 +1,237 @@
+"""Инференс случайного леса на плоских массивах NumPy без импорта sklearn.
+
+Модель экспортируется один раз после обучения (export_flat_model), а для сигналов
+загружается через load_current_flat_model, которая возвращает пару (model, scaler) с тем же
+интерфейсом predict/transform, что и load_model.
+"""
+import logging
+import os
+
+import numpy as np
+
+
+def flat_model_path(model_file):
+    """Returns the path of the flat export that belongs to model_file."""
+    return os.path.splitext(model_file)[0] + "_flat.npz"
+
+
+def _tree_proba_is_normalized():
+    # С sklearn 1.4 tree_.value хранит доли классов и predict_proba не делит их повторно;
+    # экспорт выполняется в процессе обучения, где sklearn уже загружен
+    import sklearn
+    major, minor = (int(part) for part in sklearn.__version__.split(".")[:2])
+    return (major, minor) >= (1, 4)
+
+
+def _model_stamp(model_file):
+    # mtime и размер pickle: по ним проверяем, что экспорт сделан из текущей модели
+    stat = os.stat(model_file)
+    return np.array([stat.st_mtime_ns, stat.st_size], dtype=np.int64)
+
+
+class FlatScaler:
+    """StandardScaler.transform on plain arrays.
+
+    Args:
+        mean: StandardScaler.mean_, or None if the scaler was fitted with with_mean=False.
+        scale: StandardScaler.scale_, or None if the scaler was fitted with with_std=False.
+    """
+
+    def __init__(self, mean=None, scale=None):
+        self.mean = mean
+        self.scale = scale
+
+    def transform(self, X):
+        X = np.array(X, dtype=np.float64, ndmin=2)
+        n_features = len(self.mean) if self.mean is not None else len(self.scale) if self.scale is not None else None
+        if X.ndim != 2 or (n_features is not None and X.shape[1] != n_features):
+            raise ValueError(f"X has shape {X.shape}, but the scaler expects {n_features} features.")
+        # Тот же порядок операций, что и в sklearn, чтобы результат совпадал побитово
+        if self.mean is not None:
+            X -= self.mean
+        if self.scale is not None:
+            X /= self.scale
+        return X
+
+
+class FlatForest:
+    """RandomForestClassifier.predict over all trees at once.
+
+    All trees are stored as one set of node arrays. Leaves point to themselves, so every
+    tree can be advanced one level per step with fancy indexing until the deepest leaf.
+
+    Args:
+        left, right: Child node indices (global); leaves point to themselves.
+        feature: Split feature per node (0 for leaves).
+        threshold: Split threshold per node.
+        leaf_proba: Normalized class probabilities per node, shape (n_nodes, n_classes).
+        roots: Global index of the root of each tree.
+        depth: Maximum tree depth.
+        classes: Class labels, as RandomForestClassifier.classes_.
+        n_features: RandomForestClassifier.n_features_in_.
+        missing_go_to_left: Per-node routing of NaN features, or None if the sklearn version
+            that trained the forest has no missing-value support (NaN input is then rejected).
+    """
+
+    def __init__(self, left, right, feature, threshold, leaf_proba, roots, depth, classes, n_features,
+                 missing_go_to_left=None):
+        self.left = left
+        self.right = right
+        self.feature = feature
+        self.threshold = threshold
+        self.leaf_proba = leaf_proba
+        self.roots = roots
+        self.depth = int(depth)
+        self.classes = classes
+        self.n_features = int(n_features)
+        self.missing_go_to_left = missing_go_to_left
+
+    def _validate(self, X):
+        # Деревья sklearn сравнивают признаки во float32
+        X = np.asarray(X, dtype=np.float32)
+        if X.ndim != 2 or X.shape[1] != self.n_features:
+            raise ValueError(f"X has shape {X.shape}, but the forest expects {self.n_features} features.")
+        if np.isinf(X).any():
+            raise ValueError("Input X contains infinity or a value too large for float32.")
+        has_nan = bool(np.isnan(X).any())
+        if has_nan and self.missing_go_to_left is None:
+            raise ValueError("Input X contains NaN and the exported forest has no missing-value routing.")
+        return X, has_nan
+
+    def apply(self, X):
+        """Returns the leaf index reached in every tree, shape (n_trees, n_rows)."""
+        X, has_nan = self._validate(X)
+        rows = np.arange(X.shape[0])
+        nodes = np.repeat(self.roots[:, None], X.shape[0], axis=1)
+        for _ in range(self.depth):
+            values = X[rows, self.feature[nodes]]
+            go_left = values <= self.threshold[nodes]
+            if has_nan:
+                go_left = np.where(np.isnan(values), self.missing_go_to_left[nodes], go_left)
+            nodes = np.where(go_left, self.left[nodes], self.right[nodes])
+        return nodes
+
+    def predict_proba(self, X):
+        # Сумма по оси деревьев идет последовательно, как накопление в sklearn
+        proba = self.leaf_proba[self.apply(X)].sum(axis=0)
+        proba /= len(self.roots)
+        return proba
+
+    def predict(self, X):
+        return self.classes.take(np.argmax(self.predict_proba(X), axis=1), axis=0)
+
+
+def export_flat_model(model, scaler, flat_file, model_file=None):
+    """Exports a fitted RandomForestClassifier and StandardScaler to a .npz file.
+
+    Args:
+        model: Fitted RandomForestClassifier (single output).
+        scaler: Fitted StandardScaler.
+        flat_file: Output path.
+        model_file: Pickle the export is made from; its mtime and size are stored so that
+            load_current_flat_model can reject an export left over from an older model.
+    """
+    if getattr(model, "n_outputs_", 1) != 1:
+        raise ValueError("Only single-output forests can be exported.")
+
+    proba_is_normalized = _tree_proba_is_normalized()
+    left, right, feature, threshold, leaf_proba, roots, missing = [], [], [], [], [], [], []
+    offset, depth = 0, 0
+    for estimator in model.estimators_:
+        tree = estimator.tree_
+        node_ids = np.arange(tree.node_count)
+        is_leaf = tree.children_left == -1
+
+        left.append(np.where(is_leaf, node_ids, tree.children_left) + offset)
+        right.append(np.where(is_leaf, node_ids, tree.children_right) + offset)
+        feature.append(np.where(is_leaf, 0, tree.feature))
+        threshold.append(tree.threshold)
+        if hasattr(tree, "missing_go_to_left"):  # sklearn >= 1.3
+            missing.append(np.asarray(tree.missing_go_to_left, dtype=bool) & ~is_leaf)
+
+        # Повторяем DecisionTreeClassifier.predict_proba той версии sklearn, что обучила лес
+        value = tree.value[:, 0, :].astype(np.float64)
+        if not proba_is_normalized:
+            normalizer = value.sum(axis=1)[:, None]
+            normalizer[normalizer == 0.0] = 1.0
+            value = value / normalizer
+        leaf_proba.append(value)
+
+        roots.append(offset)
+        offset += tree.node_count
+        depth = max(depth, tree.max_depth)
+
+    # Пишем во временный файл и подменяем: сканер не должен прочитать недописанный экспорт
+    tmp_file = flat_file + ".tmp"
+    with open(tmp_file, "wb") as file:
+        np.savez(
+            file,
+            left=np.concatenate(left).astype(np.intp),
+            right=np.concatenate(right).astype(np.intp),
+            feature=np.concatenate(feature).astype(np.intp),
+            threshold=np.concatenate(threshold).astype(np.float64),
+            leaf_proba=np.concatenate(leaf_proba),
+            roots=np.array(roots, dtype=np.intp),
+            depth=np.array(depth),
+            classes=np.asarray(model.classes_),
+            n_features=np.array(model.n_features_in_),
+            missing_go_to_left=np.concatenate(missing) if missing else np.array([], dtype=bool),
+            mean=np.asarray(scaler.mean_ if scaler.with_mean else []),
+            scale=np.asarray(scaler.scale_ if scaler.with_std else []),
+            model_stamp=_model_stamp(model_file) if model_file else np.array([], dtype=np.int64),
+        )
+    os.replace(tmp_file, flat_file)
+    logging.info(f"Flat model exported to {flat_file}.")
+
+
+def remove_flat_model(model_file):
+    """Deletes the flat export of model_file, if any, so a stale forest cannot be served."""
+    try:
+        os.remove(flat_model_path(model_file))
+        logging.warning(f"Removed stale flat model for {model_file}.")
+    except FileNotFoundError:
+        pass
+
+
+def load_flat_model(flat_file):
+    """Loads a flat model exported by export_flat_model.
+
+    Returns:
+        tuple: (FlatForest, FlatScaler), usable in place of (model, scaler).
+    """
+    with np.load(flat_file, allow_pickle=False) as arrays:
+        missing = arrays["missing_go_to_left"]
+        forest = FlatForest(
+            arrays["left"], arrays["right"], arrays["feature"], arrays["threshold"],
+            arrays["leaf_proba"], arrays["roots"], arrays["depth"], arrays["classes"],
+            arrays["n_features"], missing if missing.size else None,
+        )
+        mean, scale = arrays["mean"], arrays["scale"]
+    scaler = FlatScaler(mean if mean.size else None, scale if scale.size else None)
+    logging.info(f"Flat model loaded from {flat_file}.")
+    return forest, scaler
+
+
+def is_flat_model_current(model_file):
+    """True if the flat export of model_file exists and was made from the current pickle."""
+    flat_file = flat_model_path(model_file)
+    if not os.path.exists(flat_file) or not os.path.exists(model_file):
+        return False
+    try:
+        with np.load(flat_file, allow_pickle=False) as arrays:
+            stamp = arrays["model_stamp"] if "model_stamp" in arrays.files else np.array([])
+    except Exception as e:
+        logging.error(f"Error reading flat model {flat_file}: {e}")
+        return False
+    return stamp.size == 2 and np.array_equal(stamp, _model_stamp(model_file))
+
+
+def load_current_flat_model(model_file):
+    """Loads the flat export of model_file if it matches the current pickle.
+
+    Returns:
+        tuple or None: (FlatForest, FlatScaler), or None if there is no up-to-date export.
+    """
+    if not is_flat_model_current(model_file):
+        return None
+    return load_flat_model(flat_model_path(model_file))
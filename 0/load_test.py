@@ -0,0 +1,351 @@
+"""Сквозной нагрузочный тест бота: реальные обработчики, фейковый Telegram и биржа с повтором свечей.
+
+Обновления проходят через настоящий Application (с updater=None): источник кладет Update в
+update_queue, диспетчеризация и concurrent_updates — как в боевом режиме. Запросы к Bot API
+отвечает StubBot локально. Обработчики и биржа работают с общими parquet-, model- и CSV-файлами
+во временной директории.
+
+Ограничение: generate_signals сейчас падает на каждом вызове (проверка `not prices` на массиве,
+заглушка signal_info и 2 признака для модели на 10), поэтому send_signal и запись в CSV не
+выполняются. Ошибка перехватывается и только логируется — отчет показывает число таких ошибок
+и предупреждает, что скорость измерена не на полностью рабочем конвейере.
+
+Запуск:
+    python load_test.py --users 20 --duration 30 --speed 3600 --candles recorded.parquet
+"""
+import argparse
+import asyncio
+import itertools
+import logging
+import os
+import random
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+
+# config.py требует ключи при импорте; для офлайн-прогона достаточно заглушек
+for _key in ("API_KEY", "API_SECRET", "TELEGRAM_TOKEN", "CHAT_ID"):
+    os.environ.setdefault(_key, "load-test")
+
+from telegram import Update  # noqa: E402
+from telegram.ext import ApplicationBuilder, ExtBot, TypeHandler  # noqa: E402
+
+from main import register_handlers  # noqa: E402
+from model_handler import load_model  # noqa: E402
+from utils import initialize_csv  # noqa: E402
+from config import MODEL_FILE, CSV_FILE  # noqa: E402
+
+TIMEFRAME_SECONDS = {"1m": 60, "5m": 300, "15m": 900, "1h": 3600, "4h": 14400, "1d": 86400}
+
+
+class ReplayExchange:
+    """Fake ccxt exchange that replays recorded candles at accelerated speed.
+
+    Args:
+        candles (pd.DataFrame): Recorded OHLCV with 'symbol', 'timestamp', 'open', 'high', 'low', 'close',
+            'volume' columns.
+        speed (float): Replay speed multiplier (3600 = one hour of market time per second).
+        timeframe (str): Timeframe of the recorded candles.
+        warmup (int): Number of bars visible at the start of the replay.
+    """
+
+    def __init__(self, candles, speed=3600.0, timeframe="1d", warmup=100):
+        self.columns = ["timestamp", "open", "high", "low", "close", "volume"]
+        self.bars = {
+            symbol: group.sort_values("timestamp")[self.columns].values.tolist()
+            for symbol, group in candles.groupby("symbol")
+        }
+        self.speed = speed
+        self.bar_seconds = TIMEFRAME_SECONDS.get(timeframe, 86400)
+        self.warmup = warmup
+        self.started_at = time.monotonic()
+        self.calls = 0
+
+    def fetch_markets(self):
+        return [{"symbol": symbol} for symbol in self.bars]
+
+    def fetch_ohlcv(self, symbol, timeframe="1d", limit=500):
+        self.calls += 1
+        bars = self.bars[symbol]
+        elapsed_bars = int((time.monotonic() - self.started_at) * self.speed / self.bar_seconds)
+        end = min(len(bars), self.warmup + elapsed_bars)
+        return bars[max(0, end - limit):end]
+
+
+def synthetic_candles(symbols, bars=1000, seed=42):
+    """Generates random-walk candles when no recording is supplied.
+
+    Args:
+        symbols (list): Trading symbols.
+        bars (int): Number of bars per symbol.
+        seed (int): Random seed.
+
+    Returns:
+        pd.DataFrame: OHLCV rows for all symbols.
+    """
+    rng = np.random.default_rng(seed)
+    frames = []
+    for symbol in symbols:
+        close = 100 * np.exp(np.cumsum(rng.normal(0, 0.02, bars)))
+        spread = close * rng.uniform(0.001, 0.02, bars)
+        frames.append(pd.DataFrame({
+            "symbol": symbol,
+            "timestamp": np.arange(bars, dtype=np.int64) * 86_400_000,
+            "open": np.roll(close, 1),
+            "high": close + spread,
+            "low": close - spread,
+            "close": close,
+            "volume": rng.uniform(1e3, 1e5, bars),
+        }))
+    return pd.concat(frames, ignore_index=True)
+
+
+def load_candles(path):
+    """Loads recorded candles from a Parquet or CSV file."""
+    if path.endswith(".parquet"):
+        return pd.read_parquet(path)
+    return pd.read_csv(path)
+
+
+class StubBot(ExtBot):
+    """Bot whose Bot API calls are answered locally, so the real Application runs without network.
+
+    Only the calls the handlers make are answered with realistic objects; the rest return True.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        with self._unfrozen():  # объекты PTB заморожены после __init__
+            self.calls = {}
+            self._message_ids = itertools.count(1)
+
+    async def _do_post(self, endpoint, data, **kwargs):
+        self.calls[endpoint] = self.calls.get(endpoint, 0) + 1
+        if endpoint == "getMe":
+            return {"id": 1, "is_bot": True, "first_name": "LoadTest", "username": "load_test_bot"}
+        if endpoint == "sendMessage":
+            return {
+                "message_id": next(self._message_ids),
+                "date": int(time.time()),
+                "chat": {"id": int(data["chat_id"]), "type": "private"},
+                "text": data.get("text", ""),
+            }
+        return True
+
+    @property
+    def messages_sent(self):
+        return self.calls.get("sendMessage", 0)
+
+
+class ErrorCounter(logging.Handler):
+    """Counts ERROR records: the handlers catch their own exceptions and only log them."""
+
+    def __init__(self):
+        super().__init__(level=logging.ERROR)
+        self.count = 0
+
+    def emit(self, record):
+        self.count += 1
+
+
+def rss_mb():
+    """Current resident set size of the process in MB, or None where /proc is not available."""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 2 ** 20
+    except (OSError, ValueError, AttributeError):
+        return None
+
+
+class UpdateSource:
+    """Fake Telegram update source: builds real Update objects and feeds them to Application.update_queue."""
+
+    def __init__(self, application):
+        self.application = application
+        self.update_ids = itertools.count(1)
+        self.message_ids = itertools.count(1)
+        self.enqueued_at = {}
+        self.latencies = []
+
+    @staticmethod
+    def _user(user_id):
+        return {"id": user_id, "is_bot": False, "first_name": f"user{user_id}"}
+
+    def _message(self, user_id, text):
+        return {
+            "message_id": next(self.message_ids),
+            "date": int(time.time()),
+            "chat": {"id": user_id, "type": "private"},
+            "from": self._user(user_id),
+            "text": text,
+        }
+
+    async def send_text(self, user_id, text):
+        await self._put({"update_id": next(self.update_ids), "message": self._message(user_id, text)})
+
+    async def press_button(self, user_id, callback_data):
+        await self._put({
+            "update_id": next(self.update_ids),
+            "callback_query": {
+                "id": str(next(self.message_ids)),
+                "from": self._user(user_id),
+                "chat_instance": str(user_id),
+                "data": callback_data,
+                "message": self._message(user_id, "Выберите токен:"),
+            },
+        })
+
+    async def _put(self, payload):
+        update = Update.de_json(payload, self.application.bot)
+        self.enqueued_at[update.update_id] = time.perf_counter()
+        await self.application.update_queue.put(update)
+
+    async def mark_done(self, update, context):
+        """Runs in a later handler group, i.e. after the bot's own handlers finished with the update."""
+        started = self.enqueued_at.pop(update.update_id, None)
+        if started is not None:
+            self.latencies.append(time.perf_counter() - started)
+
+    async def drain(self, timeout=60.0):
+        deadline = time.monotonic() + timeout
+        while self.enqueued_at and time.monotonic() < deadline:
+            await asyncio.sleep(0.01)
+
+
+async def simulated_user(user_id, source, application, symbols, stop_at, think_time, rng):
+    """Adds tokens via text messages, then keeps pressing signal buttons for the tokens it added."""
+    for symbol in rng.sample(symbols, k=min(3, len(symbols))):
+        await source.send_text(user_id, symbol.split("/")[0])
+        await asyncio.sleep(think_time)
+
+    while time.monotonic() < stop_at:
+        user_tickers = application.user_data.get(user_id, {}).get("user_tickers")
+        if user_tickers:
+            await source.press_button(user_id, f"signal_{rng.choice(user_tickers)}")
+        await asyncio.sleep(think_time * rng.uniform(0.5, 1.5))
+
+
+async def run_load_test(exchange, users=10, duration=30.0, concurrency=1, think_time=0.05, seed=42):
+    """Runs N simulated users through a real Application with the bot's handlers and measures the pipeline.
+
+    Args:
+        exchange: Exchange object (normally ReplayExchange).
+        users (int): Number of concurrent simulated users.
+        duration (float): Length of the measured run in seconds.
+        concurrency (int): Application's concurrent_updates; 1 processes updates one by one, as by default.
+        think_time (float): Average pause between actions of one user, seconds.
+        seed (int): Random seed for user behaviour.
+
+    Returns:
+        dict: updates, updates_per_sec, p50_ms, p99_ms, handler_failures (raised out of the handlers),
+            logged_errors (ERROR records, including errors the handlers swallowed), messages_sent,
+            rss_growth_mb, exchange_calls.
+    """
+    tickers = [market["symbol"] for market in exchange.fetch_markets()]
+
+    # Модель обучаем до старта замера, чтобы первый нажавший кнопку не платил за обучение
+    load_model(MODEL_FILE, tickers, exchange)
+    initialize_csv()
+
+    bot = StubBot(token="123456:LOAD-TEST")
+    application = (
+        ApplicationBuilder().bot(bot).updater(None)
+        .concurrent_updates(concurrency if concurrency > 1 else False)
+        .build()
+    )
+    register_handlers(application, {"exchange": exchange, "tickers": tickers, "model_file": MODEL_FILE,
+                                    "csv_file": CSV_FILE, "chat_id": os.environ["CHAT_ID"]})
+    source = UpdateSource(application)
+    application.add_handler(TypeHandler(Update, source.mark_done), group=1)
+
+    failures = []
+
+    async def on_error(update, context):
+        failures.append(context.error)
+
+    application.add_error_handler(on_error)
+
+    await application.initialize()
+    await application.start()
+
+    errors = ErrorCounter()
+    logging.getLogger().addHandler(errors)
+    # RSS вместо tracemalloc: трассировка каждой аллокации замедляет pandas/talib и искажает замер
+    rss_before = rss_mb()
+    started = time.perf_counter()
+    stop_at = time.monotonic() + duration
+
+    rng = random.Random(seed)
+    try:
+        await asyncio.gather(*(
+            simulated_user(user_id, source, application, tickers, stop_at, think_time, random.Random(rng.random()))
+            for user_id in range(1, users + 1)
+        ))
+        await source.drain()
+        elapsed = time.perf_counter() - started
+        rss_after = rss_mb()
+    finally:
+        logging.getLogger().removeHandler(errors)
+        await application.stop()
+        await application.shutdown()
+
+    latencies_ms = np.array(source.latencies) * 1000 if source.latencies else np.array([np.nan])
+    return {
+        "updates": len(source.latencies),
+        "updates_per_sec": len(source.latencies) / elapsed if elapsed > 0 else 0.0,
+        "p50_ms": float(np.percentile(latencies_ms, 50)),
+        "p99_ms": float(np.percentile(latencies_ms, 99)),
+        "handler_failures": len(failures),
+        "logged_errors": errors.count,
+        "messages_sent": bot.messages_sent,
+        "rss_growth_mb": rss_after - rss_before if rss_before is not None and rss_after is not None else None,
+        "exchange_calls": getattr(exchange, "calls", None),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="End-to-end load test of the bot pipeline.")
+    parser.add_argument("--users", type=int, default=10, help="Number of concurrent simulated users.")
+    parser.add_argument("--duration", type=float, default=30.0, help="Measured run length, seconds.")
+    parser.add_argument("--concurrency", type=int, default=1, help="Application concurrent_updates.")
+    parser.add_argument("--think-time", type=float, default=0.05, help="Average pause between user actions.")
+    parser.add_argument("--speed", type=float, default=3600.0, help="Candle replay speed multiplier.")
+    parser.add_argument("--timeframe", default="1d", help="Timeframe of the recorded candles.")
+    parser.add_argument("--candles", help="Recorded candles (.parquet or .csv); synthetic if omitted.")
+    parser.add_argument("--symbols", type=int, default=10, help="Number of synthetic symbols.")
+    parser.add_argument("--workdir", help="Directory for the shared parquet, model and CSV files.")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.WARNING)
+
+    if args.candles:
+        candles = load_candles(os.path.abspath(args.candles))
+    else:
+        candles = synthetic_candles([f"TOK{i}/USDT" for i in range(args.symbols)])
+
+    # Обработчики работают с файлами в текущей директории — изолируем их от боевых
+    os.chdir(args.workdir or tempfile.mkdtemp(prefix="bot-load-test-"))
+
+    exchange = ReplayExchange(candles, speed=args.speed, timeframe=args.timeframe)
+    report = asyncio.run(run_load_test(exchange, users=args.users, duration=args.duration,
+                                       concurrency=args.concurrency, think_time=args.think_time))
+
+    print(f"Updates processed:   {report['updates']}")
+    print(f"Sustained updates/s: {report['updates_per_sec']:.1f}")
+    print(f"Latency p50 / p99:   {report['p50_ms']:.1f} ms / {report['p99_ms']:.1f} ms")
+    print(f"Handler failures:    {report['handler_failures']} (logged errors: {report['logged_errors']})")
+    print(f"Bot messages sent:   {report['messages_sent']}")
+    if report["rss_growth_mb"] is not None:
+        print(f"RSS growth:          {report['rss_growth_mb']:.2f} MB")
+    else:
+        print("RSS growth:          n/a (/proc not available)")
+    print(f"Exchange calls:      {report['exchange_calls']}")
+    if report["handler_failures"] or report["logged_errors"]:
+        print("WARNING: errors were raised or logged during the run. Handlers swallow their own failures, "
+              "so the figures above describe a partly failing pipeline, not a working one.")
+
+
+if __name__ == "__main__":
+    main()
@@ -2,23 +2,38 @@ import asyncio
 import logging
 import os
 from telegram.ext import ApplicationBuilder, CommandHandler, MessageHandler, filters, CallbackQueryHandler
-from telegram_bot import start, handle_message, button_handler
-from model_handler import load_model, train_model, save_model
-from data_handler import load_tickers, initialize_csv
-from utils import create_token_keyboard
+from telegram_bot import start, on_message, on_button
+from flat_forest import load_current_flat_model
+from data_handler import load_tickers
+from utils import initialize_csv
 import ccxt
-from config import API_KEY, API_SECRET, TELEGRAM_TOKEN, CHAT_ID, MODEL_FILE, CSV_FILE, EXCHANGE_ID
+from config import API_KEY, API_SECRET, TELEGRAM_TOKEN, CHAT_ID, MODEL_FILE, CSV_FILE, EXCHANGE_ID, SCAN_WORKERS
+from scale_out import ScanCoordinator
+
+def register_handlers(application, bot_data):
+    application.bot_data.update(bot_data)  # Отсюда адаптеры берут биржу, тикеры и пути к файлам
+    application.add_handler(CommandHandler("start", start))
+    application.add_handler(MessageHandler(filters.TEXT & ~filters.COMMAND, on_message))
+    application.add_handler(CallbackQueryHandler(on_button))
+
 
 async def initialize_bot(telegram_token, bot_data):
     application = ApplicationBuilder().token(telegram_token).build()
-    application.add_handler(CommandHandler("start", start))
-    application.add_handler(MessageHandler(filters.TEXT & ~filters.COMMAND, handle_message))
-    application.add_handler(CallbackQueryHandler(button_handler, pass_job_queue=True, pass_chat_data=True))
+    register_handlers(application, bot_data)
     return application
 
 
 async def run_bot(application):
-    await application.run_polling()
+    # Неблокирующий запуск: run_polling сам владеет циклом событий и не вызывается из asyncio.run
+    await application.initialize()
+    await application.start()
+    await application.updater.start_polling()
+
+
+async def stop_bot(application):
+    await application.updater.stop()
+    await application.stop()
+    await application.shutdown()
 
 
 async def initialize_app(exchange_id, api_key, api_secret):
@@ -30,7 +45,12 @@ async def initialize_app(exchange_id, api_key, api_secret):
     })
     tickers = load_tickers(exchange)
     initialize_csv()
-    model, scaler = load_model(MODEL_FILE, tickers, exchange)
+    flat_model = load_current_flat_model(MODEL_FILE)  # Быстрый инференс без sklearn
+    if flat_model is not None:
+        model, scaler = flat_model
+    else:
+        from model_handler import load_model  # sklearn импортируется только без актуального экспорта
+        model, scaler = load_model(MODEL_FILE, tickers, exchange)
     return exchange, tickers, model, scaler
 
 
@@ -43,8 +63,32 @@ async def main():
     try:
         exchange, tickers, model, scaler = await initialize_app(EXCHANGE_ID, API_KEY, API_SECRET)
         bot = ccxt.binance({'apiKey': API_KEY, 'secret': API_SECRET, 'enableRateLimit': True})
-        application = await initialize_bot(telegram_token, {'exchange': exchange, 'tickers': tickers, 'model': model, 'scaler': scaler, 'model_file': MODEL_FILE, 'csv_file': CSV_FILE})
+        application = await initialize_bot(telegram_token, {'exchange': exchange, 'tickers': tickers, 'model': model, 'scaler': scaler, 'model_file': MODEL_FILE, 'csv_file': CSV_FILE, 'chat_id': CHAT_ID})
+
+        coordinator = None
+        coordinator_task = None
         await run_bot(application)
+        try:
+            if SCAN_WORKERS > 0:
+                # Фронтенд держит только Telegram; данные, индикаторы и инференс — в процессах-сканерах
+                coordinator = ScanCoordinator(SCAN_WORKERS, EXCHANGE_ID, API_KEY, API_SECRET, MODEL_FILE, CSV_FILE)
+                coordinator.start()
+                application.bot_data["coordinator"] = coordinator
+                coordinator_task = asyncio.create_task(coordinator.run(application.bot))
+
+            await asyncio.Event().wait()  # Работаем до Ctrl+C: asyncio.run отменит эту задачу
+        finally:
+            if coordinator_task is not None:
+                coordinator_task.cancel()
+                try:
+                    await coordinator_task
+                except asyncio.CancelledError:
+                    pass
+                except Exception as e:
+                    logging.exception(f"Scan coordinator failed: {e}")
+            if coordinator is not None:
+                coordinator.stop()
+            await stop_bot(application)
     except Exception as e:
         logging.exception(f"Fatal error: {e}")
 
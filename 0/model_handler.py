@@ -10,6 +10,7 @@ from data_handler import fetch_data, prepare_data
 import logging
 from sklearn.metrics import accuracy_score, precision_score, recall_score, f1_score
 from data_handler import fetch_data, prepare_data  # explicit import
+from flat_forest import export_flat_model, flat_model_path, is_flat_model_current, remove_flat_model
 
 
 def save_model(model, scaler, model_file):  # Добавлен model_file
@@ -21,6 +22,21 @@ def save_model(model, scaler, model_file):  # Добавлен model_file
         logging.error(f"Error saving model and scaler to {model_file}: {e}")
         raise  # Генерируем исключение
 
+    # Плоская копия для быстрого инференса; без нее сигналы работают через pickle
+    export_flat_model_safely(model, scaler, model_file)
+
+
+def export_flat_model_safely(model, scaler, model_file):
+    """Exports the flat model next to model_file; on failure removes the stale export instead of raising."""
+    try:
+        export_flat_model(model, scaler, flat_model_path(model_file), model_file)
+    except Exception as e:
+        logging.error(f"Error exporting flat model for {model_file}: {e}")
+        try:
+            remove_flat_model(model_file)
+        except OSError as e:
+            logging.error(f"Error removing stale flat model for {model_file}: {e}")
+
 
 # Обучение модели
 def train_model(tickers, exchange, model_file):  # Добавили exchange и model_file
@@ -69,6 +85,8 @@ def load_model(model_file, tickers, exchange):  # Добавлен exchange
             with open(model_file, "rb") as file:
                 model, scaler = pickle.load(file)
             logging.info(f"Model and scaler loaded from {model_file} successfully.")
+            if not is_flat_model_current(model_file):  # Экспорта нет или он от другой модели
+                export_flat_model_safely(model, scaler, model_file)
             return model, scaler
         else:
             logging.info(f"Model file {model_file} not found. Training a new model.")
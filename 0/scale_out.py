@@ -0,0 +1,305 @@
+"""Режим масштабирования: один фронтенд-процесс с Telegram Application и N процессов-сканеров.
+
+Каждый символ закреплен за одним сканером через консистентное хеширование (ShardRing).
+Задачи уходят в очередь своего сканера, результаты возвращаются в общую очередь, а
+отправку в Telegram и запись в CSV делает только фронтенд. Упавший сканер перезапускается,
+а его незавершенные задачи отправляются повторно, но не больше max_attempts раз; если сканер
+падает слишком часто, его шарды переходят к оставшимся.
+"""
+import asyncio
+import bisect
+import hashlib
+import itertools
+import logging
+import multiprocessing
+import queue
+import time
+
+import ccxt
+
+from data_handler import fetch_data, prepare_data
+from flat_forest import load_current_flat_model
+from strategy import generate_signals
+from telegram_bot import send_signal
+from utils import send_volatility_volume_alerts, volatility_volume_flags
+
+
+class ShardRing:
+    """Consistent hash ring mapping symbols to worker ids.
+
+    Removing a worker only moves the symbols that worker owned; every other symbol keeps its
+    worker, so the workers' parquet caches stay warm.
+
+    Args:
+        worker_ids: Initial worker ids.
+        replicas: Virtual nodes per worker, evens out shard sizes.
+    """
+
+    def __init__(self, worker_ids, replicas=64):
+        self.replicas = replicas
+        self._keys = []
+        self._owners = []
+        for worker_id in worker_ids:
+            self.add(worker_id)
+
+    @staticmethod
+    def _hash(key):
+        # md5, а не hash(): результат должен совпадать во всех процессах и между запусками
+        return int(hashlib.md5(key.encode("utf-8")).hexdigest()[:16], 16)
+
+    def add(self, worker_id):
+        for replica in range(self.replicas):
+            key = self._hash(f"{worker_id}:{replica}")
+            index = bisect.bisect(self._keys, key)
+            self._keys.insert(index, key)
+            self._owners.insert(index, worker_id)
+
+    def remove(self, worker_id):
+        kept = [(key, owner) for key, owner in zip(self._keys, self._owners) if owner != worker_id]
+        self._keys = [key for key, _ in kept]
+        self._owners = [owner for _, owner in kept]
+
+    def workers(self):
+        return set(self._owners)
+
+    def assign(self, symbol):
+        """Returns the worker id that owns symbol."""
+        if not self._keys:
+            raise ValueError("No live workers to assign symbols to.")
+        index = bisect.bisect(self._keys, self._hash(symbol)) % len(self._keys)
+        return self._owners[index]
+
+
+def scan_symbol(exchange, model, scaler, symbol, parquet_file):
+    """Fetches data and computes the signal for one symbol inside a worker.
+
+    Returns:
+        dict: 'signal_info' (or None), 'trend' and 'alerts' (high volatility, high volume) for the symbol.
+    """
+    data = fetch_data(exchange, symbol, parquet_file=parquet_file)
+    if data is None or data.empty:
+        raise ValueError(f"No data available for {symbol}.")
+
+    signal_info = None
+    if model is not None and scaler is not None:
+        signal_info = generate_signals(model, scaler, data["close"].values, symbol)
+
+    trend = data["trend"].iloc[-1] if "trend" in data.columns else "N/A"
+
+    # Те же оповещения, что и в однопроцессном режиме; prepare_data добавляет нужные столбцы
+    try:
+        prepare_data(data)
+        alerts = volatility_volume_flags(data)
+    except Exception as e:
+        logging.error(f"Error computing volatility/volume alerts for {symbol}: {e}")
+        alerts = (False, False)
+
+    return {"signal_info": signal_info, "trend": trend, "alerts": alerts}
+
+
+def scan_worker(worker_id, task_queue, result_queue, exchange_id, api_key, api_secret, model_file):
+    """Worker process loop: owns its own exchange client, model and parquet file.
+
+    Tasks are dicts with 'task_id', 'symbol' and 'chat_id'; None stops the worker.
+    """
+    logging.basicConfig(level=logging.INFO, format=f"%(asctime)s worker-{worker_id} %(levelname)s %(message)s")
+    exchange = getattr(ccxt, exchange_id)({
+        'apiKey': api_key,
+        'secret': api_secret,
+        'enableRateLimit': True,
+    })
+
+    flat_model = load_current_flat_model(model_file)
+    if flat_model is not None:
+        model, scaler = flat_model
+    else:
+        from model_handler import load_model  # sklearn импортируется только без плоской модели
+        model, scaler = load_model(model_file, [], exchange)
+
+    # Свой parquet у каждого сканера: шарды не пересекаются, и процессы не пишут в один файл
+    parquet_file = f"worker_{worker_id}_data.parquet"
+    logging.info(f"Worker {worker_id} started.")
+
+    while True:
+        task = task_queue.get()
+        if task is None:
+            break
+
+        result = {"task_id": task["task_id"], "symbol": task["symbol"], "chat_id": task["chat_id"],
+                  "worker_id": worker_id, "error": None}
+        try:
+            result.update(scan_symbol(exchange, model, scaler, task["symbol"], parquet_file))
+        except Exception as e:
+            logging.error(f"Error scanning {task['symbol']}: {e}")
+            result["error"] = str(e)
+        result_queue.put(result)
+
+    logging.info(f"Worker {worker_id} stopped.")
+
+
+class ScanCoordinator:
+    """Front-end side of the scale-out mode: routes symbols to workers and delivers results.
+
+    Args:
+        n_workers: Number of worker processes.
+        exchange_id, api_key, api_secret: Exchange settings passed to every worker.
+        model_file: Model pickle; workers prefer its flat export when it exists.
+        csv_file: Signal log, written only by the front end.
+        max_restarts: Restarts per worker before its shards are moved to the other workers for good.
+        healthy_after: Seconds of uptime after which a worker's restart count is reset.
+        max_attempts: Dispatches per task; a task whose workers keep dying is dropped after that.
+    """
+
+    def __init__(self, n_workers, exchange_id, api_key, api_secret, model_file, csv_file, max_restarts=3,
+                 healthy_after=3600, max_attempts=3):
+        self.n_workers = n_workers
+        self.worker_args = (exchange_id, api_key, api_secret, model_file)
+        self.csv_file = csv_file
+        self.ring = ShardRing(range(n_workers))
+        # spawn, а не fork: фронтенд многопоточный (PTB, executor в run()), fork может унести чужие блокировки
+        self.mp_context = multiprocessing.get_context("spawn")
+        self.processes = {}
+        self.task_queues = {}
+        self.result_queue = self.mp_context.Queue()
+        self.pending = {}  # task_id -> (worker_id, задача)
+        self.max_restarts = max_restarts
+        self.healthy_after = healthy_after
+        self.max_attempts = max_attempts
+        self.restarts = {worker_id: 0 for worker_id in range(n_workers)}
+        self.started_at = {}
+        self._task_ids = itertools.count()
+        self._stopping = False
+
+    def start(self):
+        for worker_id in range(self.n_workers):
+            self._spawn(worker_id)
+        logging.info(f"Started {self.n_workers} scan workers.")
+
+    def _spawn(self, worker_id):
+        # Новая очередь: в старой могут остаться задачи, которые будут отправлены повторно
+        task_queue = self.mp_context.Queue()
+        process = self.mp_context.Process(
+            target=scan_worker,
+            args=(worker_id, task_queue, self.result_queue) + self.worker_args,
+            name=f"scan-worker-{worker_id}",
+            daemon=True,
+        )
+        process.start()
+        self.task_queues[worker_id] = task_queue
+        self.processes[worker_id] = process
+        self.started_at[worker_id] = time.monotonic()
+
+    def submit(self, symbol, chat_id):
+        """Queues a scan of symbol on the worker that owns it. Returns the task id.
+
+        Raises:
+            ValueError: If no live workers are left.
+        """
+        task = {"task_id": next(self._task_ids), "symbol": symbol, "chat_id": chat_id, "attempts": 0}
+        self._dispatch(task)
+        return task["task_id"]
+
+    def _dispatch(self, task):
+        worker_id = self.ring.assign(task["symbol"])
+        task["attempts"] += 1
+        self.pending[task["task_id"]] = (worker_id, task)
+        self.task_queues[worker_id].put(task)
+
+    def check_workers(self):
+        """Restarts dead workers and re-dispatches their unfinished tasks.
+
+        A worker that has used up max_restarts is removed from the ring, so its shards move to
+        the remaining workers. A task that has already been dispatched max_attempts times is not
+        sent again: a symbol that crashes its worker would otherwise take down every worker.
+
+        Returns:
+            list: Dropped tasks, so the caller can tell their chats.
+        """
+        dropped = []
+        if self._stopping:
+            return dropped
+        for worker_id in list(self.ring.workers()):
+            process = self.processes[worker_id]
+            if process.is_alive():
+                if self.restarts[worker_id] and time.monotonic() - self.started_at[worker_id] > self.healthy_after:
+                    self.restarts[worker_id] = 0  # Давно работает без сбоев — прошлые падения не считаем
+                continue
+
+            self.ring.remove(worker_id)
+            if self.restarts[worker_id] < self.max_restarts:
+                self.restarts[worker_id] += 1
+                logging.error(f"Scan worker {worker_id} died (exit code {process.exitcode}). "
+                              f"Restarting ({self.restarts[worker_id]}/{self.max_restarts}).")
+                try:
+                    self._spawn(worker_id)
+                    self.ring.add(worker_id)
+                except Exception as e:
+                    logging.error(f"Error restarting scan worker {worker_id}: {e}")
+            else:
+                logging.critical(f"Scan worker {worker_id} keeps dying. Moving its shards to other workers.")
+
+            orphaned = [task for owner, task in self.pending.values() if owner == worker_id]
+            for task in orphaned:
+                if task["attempts"] >= self.max_attempts:
+                    logging.error(f"Dropping scan of {task['symbol']} after {task['attempts']} attempts.")
+                    self.pending.pop(task["task_id"], None)
+                    dropped.append(task)
+                    continue
+                try:
+                    self._dispatch(task)
+                except ValueError as e:
+                    logging.critical(f"Cannot reassign {task['symbol']}: {e}")
+                    self.pending.pop(task["task_id"], None)
+                    dropped.append(task)
+        return dropped
+
+    async def run(self, bot, poll_interval=0.5):
+        """Delivers worker results to Telegram and watches worker health until stop() is called."""
+        loop = asyncio.get_running_loop()
+        while not self._stopping:
+            result = await loop.run_in_executor(None, self._get_result, poll_interval)
+            if result is not None:
+                await self._deliver(result, bot)
+            for task in self.check_workers():
+                await self._notify_dropped(task, bot)
+
+    def _get_result(self, timeout):
+        try:
+            return self.result_queue.get(timeout=timeout)
+        except queue.Empty:
+            return None
+
+    async def _deliver(self, result, bot):
+        # Повторно отправленная задача может вернуться дважды — доставляем один раз
+        if self.pending.pop(result["task_id"], None) is None:
+            return
+
+        symbol, chat_id = result["symbol"], result["chat_id"]
+        try:
+            if result["error"]:
+                await bot.send_message(chat_id=chat_id, text=f"Ошибка получения данных для {symbol}")
+                return
+            if result["signal_info"]:
+                await send_signal(result["signal_info"], bot, chat_id, self.csv_file)
+            else:
+                logging.warning(f"No signal generated for {symbol}.")
+            await bot.send_message(chat_id=chat_id, text=f"Текущий тренд для {symbol}: {result['trend']}")
+            await send_volatility_volume_alerts(bot, symbol, chat_id, *result["alerts"])
+        except Exception as e:
+            logging.error(f"Error delivering result for {symbol}: {e}")
+
+    async def _notify_dropped(self, task, bot):
+        try:
+            await bot.send_message(chat_id=task["chat_id"], text=f"Не удалось получить сигнал для {task['symbol']}.")
+        except Exception as e:
+            logging.error(f"Error notifying about dropped scan of {task['symbol']}: {e}")
+
+    def stop(self, timeout=5):
+        self._stopping = True
+        for task_queue in self.task_queues.values():
+            task_queue.put(None)
+        for process in self.processes.values():
+            process.join(timeout)
+            if process.is_alive():
+                process.terminate()
+        logging.info("Scan workers stopped.")
@@ -49,13 +49,21 @@ def example_strategy(prices, symbol, avg_period=5, take_profit_pct=2, stop_loss_
         return None
 
 
-def aggregate_signals(signals, threshold=1):
+def aggregate_signals(signals, threshold=1, weights=None):
     signal_counts = {"🔺Long": 0, "🔻Short": 0}
     final_signal = None
 
-    for signal in signals:
+    signals = list(signals)  # Допускаем генератор, как и раньше
+    if weights is None:
+        weights = [1] * len(signals)  # Без весов каждая стратегия — один голос
+    else:
+        weights = list(weights)
+        if len(weights) != len(signals):
+            raise ValueError(f"Got {len(weights)} weights for {len(signals)} signals.")
+
+    for signal, weight in zip(signals, weights):
         if signal and signal.get("signal"):  # Используем get для безопасного доступа
-            signal_counts[signal["signal"]] += 1
+            signal_counts[signal["signal"]] += weight
             final_signal = signal
 
     total_signals = sum(signal_counts.values())
@@ -1,6 +1,6 @@
-from data_handler import fetch_data, is_token_available
-from model_handler import load_model, train_model, save_model  # Импортируйте train_model и save_model
+from data_handler import fetch_data, is_token_available, prepare_data
 from strategy import generate_signals
+from flat_forest import load_current_flat_model
 from utils import volatility_volume_alert, log_signal_to_csv  # Импортируйте log_signal_to_csv
 import ccxt
 import pandas as pd
@@ -27,11 +27,23 @@ async def button_handler(update: Update, context: CallbackContext, user_tickers:
     await query.answer()
 
     if query.data.startswith("signal_"):
-        token = query.data.split("_")[1]
-        symbol = f"{token}/USDT"
+        token = query.data.split("_", 1)[1]
+        symbol = token if token.endswith("/USDT") else f"{token}/USDT"  # Клавиатура передает полный символ
 
         if is_token_available(symbol, tickers):
-            await generate_and_send_signal(symbol, exchange, tickers, bot, chat_id, model_file)
+            coordinator = (context.bot_data or {}).get("coordinator")
+            if coordinator is not None:
+                try:
+                    coordinator.submit(symbol, chat_id)  # Сканирование на процессе, владеющем символом
+                except ValueError as e:
+                    logging.error(f"Cannot submit scan for {symbol}: {e}")
+                    await query.message.reply_text("Сервис сигналов временно недоступен. Попробуйте позже.")
+                    return
+                # Сигнал пришлет фронтенд, когда сканер вернет результат
+                await query.message.reply_text(f"Запрос сигнала для {token} принят.")
+                return
+            else:
+                await generate_and_send_signal(symbol, exchange, tickers, bot, chat_id, model_file, csv_file, context)
             await query.message.reply_text(f"Сигнал для {token} отправлен.")  # Пока просто сообщение
         else:
             await query.message.reply_text(f"Токен {token} недоступен.")
@@ -44,6 +56,20 @@ async def button_handler(update: Update, context: CallbackContext, user_tickers:
         reply_markup = create_token_keyboard(user_tickers)
         await update.message.reply_text("Выберите токен:", reply_markup=reply_markup)
 
+# Адаптеры для Application: PTB передает только (update, context), остальное берем из bot_data/user_data
+async def on_message(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    user_tickers = context.user_data.setdefault("user_tickers", [])
+    await handle_message(update, context, user_tickers, context.bot_data["tickers"])
+
+
+async def on_button(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    bot_data = context.bot_data
+    user_tickers = context.user_data.setdefault("user_tickers", [])
+    chat_id = update.effective_chat.id if update.effective_chat else bot_data.get("chat_id")
+    await button_handler(update, context, user_tickers, bot_data["exchange"], bot_data["tickers"], context.bot,
+                         chat_id, bot_data["model_file"], bot_data["csv_file"])
+
+
 async def get_data(update: Update, context: ContextTypes.DEFAULT_TYPE, exchange, tickers, user_tickers, bot, chat_id):
     try:
         command_parts = update.message.text.split()
@@ -88,7 +114,7 @@ async def get_data(update: Update, context: ContextTypes.DEFAULT_TYPE, exchange,
         await update.message.reply_text(f"Произошла неизвестная ошибка: {e}")
 
 
-async def generate_and_send_signal(symbol, exchange, tickers, bot, chat_id, model_file, csv_file):  # Добавлен csv_file
+async def generate_and_send_signal(symbol, exchange, tickers, bot, chat_id, model_file, csv_file, context):  # Добавлен csv_file
     """Generates and sends a trading signal.
 
     Args:
@@ -98,6 +124,8 @@ async def generate_and_send_signal(symbol, exchange, tickers, bot, chat_id, mode
         bot: telegram bot instance.
         chat_id: The Telegram chat ID.
         model_file: The path to the model file.
+        csv_file: The path to the signal log.
+        context: Handler context.
     """
     try:
         data = fetch_data(exchange, symbol)  # Передаем exchange
@@ -106,36 +134,31 @@ async def generate_and_send_signal(symbol, exchange, tickers, bot, chat_id, mode
             logging.error(f"No data available for {symbol}.")
             return
 
-        model, scaler = load_model(model_file, tickers, exchange)  # Передаем model_file, tickers, exchange
+        flat_model = load_current_flat_model(model_file)  # Быстрый инференс без sklearn
+        if flat_model is not None:
+            model, scaler = flat_model
+        else:
+            from model_handler import load_model  # sklearn импортируется только без плоской модели
+            model, scaler = load_model(model_file, tickers, exchange)  # Передаем model_file, tickers, exchange
 
         if model is not None and scaler is not None:  # Проверка на None
             signal_info = generate_signals(model, scaler, data["close"].values, symbol)
             if signal_info:
-                await send_signal(signal_info, bot, chat_id)  # Передаем bot и chat_id
+                await send_signal(signal_info, bot, chat_id, csv_file)  # Передаем bot и chat_id
             else:
                 logging.warning(f"No signal generated for {symbol}.")
-
-            last_accuracy = context.user_data.get("last_accuracy", 1.0)  # Добавьте сохранение accuracy в user_data
-            retrain_condition = last_accuracy < 0.7  # Переобучать если accuracy < 0.7
-            context.user_data["last_accuracy"] = accuracy  # accuracy  должно быть доступно в функции
-            if retrain_condition:
-                try:
-                    model, scaler = train_model(tickers, exchange, model_file)
-                    if model is not None and scaler is not None:
-                        save_model(model, scaler, model_file)
-                        logging.info(f"Model retrained and saved to {model_file}")
-                    else:
-                        logging.error("Failed to retrain model")
-                except Exception as e:
-                    logging.error(f"Error retraining model: {e}")
+            # Переобучение здесь не запускаем: train_model заново качает все рынки и блокирует цикл событий
         else:
             logging.error("Model not available for generating signals.")
 
+        # prepare_data добавляет в data столбцы volatility и market_volume, нужные оповещениям
+        prepare_data(data)
+
         trend_status = data["trend"].iloc[
             -1] if "trend" in data.columns else "N/A"  # Проверка на существование столбца.
         await bot.send_message(chat_id=chat_id, text=f"Текущий тренд для {symbol}: {trend_status}")
 
-        await volatility_volume_alert(symbol, data, bot, chat_id)  # Передаем bot и chat_id, если нужно
+        await volatility_volume_alert(bot, symbol, data, chat_id)
 
     except Exception as e:
         logging.error(f"Error in generating and sending signal for {symbol}: {e}")
@@ -177,42 +200,32 @@ async def send_signal(signal_info, bot: Bot, chat_id, csv_file): #  Добавл
 
         log_signal_to_csv(signal_info, csv_file)
 
-    from telegram import Update, Bot, InlineKeyboardButton, InlineKeyboardMarkup
-    from telegram.ext import ContextTypes, CallbackContext
-    import logging
-
-    async def handle_message(update: Update, context: CallbackContext, user_tickers: list, max_tickers: int = 5):
-        try:
-            user_input = update.message.text.strip().upper()
-
-            if user_input and not user_input.endswith("/USDT"):
-                user_input += "/USDT"
+    except Exception as e:
+        logging.error(f"Error sending signal: {e}")
 
-            logging.info(f"User input: {user_input}")
 
-            if is_token_available(user_input):  # Предполагается, что эта функция определена где-то еще
-                if len(user_tickers) < max_tickers:
-                    user_tickers.append(user_input)
-                    await update.message.reply_text(f"Токен {user_input} добавлен.")
+async def handle_message(update: Update, context: CallbackContext, user_tickers: list, tickers, max_tickers: int = 5):
+    try:
+        user_input = update.message.text.strip().upper()
 
-                    # Создаем клавиатуру только один раз и обновляем её
-                    keyboard = create_token_keyboard(user_tickers)
-                    await update.message.reply_text("Выберите токен:", reply_markup=keyboard)
-                else:
-                    await update.message.reply_text(f"Вы достигли максимального количества токенов ({max_tickers}).")
-            else:
-                await update.message.reply_text(f"Токен {user_input} недоступен на бирже.")
+        if user_input and not user_input.endswith("/USDT"):
+            user_input += "/USDT"
 
+        logging.info(f"User input: {user_input}")
 
-        except Exception as e:
-            logging.error(f"Error handling message: {e}")
-            await update.message.reply_text("Произошла ошибка при обработке сообщения.")
+        if is_token_available(user_input, tickers):
+            if len(user_tickers) < max_tickers:
+                user_tickers.append(user_input)
+                await update.message.reply_text(f"Токен {user_input} добавлен.")
 
-    def create_token_keyboard(user_tickers):  # Теперь принимает user_tickers как аргумент
-        keyboard = [[InlineKeyboardButton(token, callback_data=f"signal_{token}")] for token in user_tickers]
-        if user_tickers:
-            keyboard.append([InlineKeyboardButton("Очистить", callback_data="clear")])
-        return InlineKeyboardMarkup(keyboard)
+                # Создаем клавиатуру только один раз и обновляем её
+                keyboard = create_token_keyboard(user_tickers)
+                await update.message.reply_text("Выберите токен:", reply_markup=keyboard)
+            else:
+                await update.message.reply_text(f"Вы достигли максимального количества токенов ({max_tickers}).")
+        else:
+            await update.message.reply_text(f"Токен {user_input} недоступен на бирже.")
 
     except Exception as e:
-        logging.error(f"Error sending signal: {e}")
+        logging.error(f"Error handling message: {e}")
+        await update.message.reply_text("Произошла ошибка при обработке сообщения.")
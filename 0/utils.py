@@ -36,12 +36,25 @@ def log_signal_to_csv(signal_info, csv_file):  # Добавлен csv_file ка
 
 
 
-async def volatility_volume_alert(bot: Bot, symbol, data, volatility_threshold=1.5, volume_threshold=1.5):
+def volatility_volume_flags(data, volatility_threshold=1.5, volume_threshold=1.5):
+    """Возвращает (высокая волатильность, высокий объем) для последнего бара."""
+    high_volatility = data["volatility"].iloc[-1] > data["volatility"].mean() * volatility_threshold
+    high_volume = data["market_volume"].iloc[-1] > data["market_volume"].mean() * volume_threshold
+    return bool(high_volatility), bool(high_volume)
+
+
+async def send_volatility_volume_alerts(bot: Bot, symbol, chat_id, high_volatility, high_volume):
+    """Отправляет оповещения по уже вычисленным флагам."""
+    if high_volatility:
+        await bot.send_message(chat_id=chat_id, text=f"Высокая волатильность для {symbol}")
+    if high_volume:
+        await bot.send_message(chat_id=chat_id, text=f"Высокий объем для {symbol}")
+
+
+async def volatility_volume_alert(bot: Bot, symbol, data, chat_id, volatility_threshold=1.5, volume_threshold=1.5):
     """Отправляет оповещения о высокой волатильности или объеме."""
     try:
-        if data["volatility"].iloc[-1] > data["volatility"].mean() * volatility_threshold:
-            await bot.send_message(chat_id=CHAT_ID, text=f"Высокая волатильность для {symbol}")
-        if data["market_volume"].iloc[-1] > data["market_volume"].mean() * volume_threshold:
-            await bot.send_message(chat_id=CHAT_ID, text=f"Высокий объем для {symbol}")
+        high_volatility, high_volume = volatility_volume_flags(data, volatility_threshold, volume_threshold)
+        await send_volatility_volume_alerts(bot, symbol, chat_id, high_volatility, high_volume)
     except Exception as e:
         logging.error(f"Error sending volatility/volume alert for {symbol}: {e}")
\ No newline at end of file